@@ -2,7 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 
 from app.config.settings import settings
 
-engine = create_async_engine(settings.ASYNC_DATABASE_URL, echo=False)
+engine = create_async_engine(settings.ASYNC_DATABASE_URL, **settings.ENGINE_OPTIONS)
 
 AsyncSession = async_sessionmaker(
     bind=engine,
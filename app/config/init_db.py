@@ -1,19 +1,34 @@
 import asyncio
 
-from sqlalchemy.ext.asyncio import create_async_engine
-
+from app.config.db import engine
+from app.config.migrations import (
+    LATEST_VERSION,
+    apply_migrations,
+    current_version,
+    lock_schema,
+    partition_cars,
+)
 from app.config.settings import settings
-from app.models.base import Base
 from app.models.cars import CarModel
 
 
 async def init_db():
-    engine = create_async_engine(settings.ASYNC_DATABASE_URL, echo=True)
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    await engine.dispose()
-    print("All tables created!")
+        await lock_schema(conn)
+        version = await current_version(conn)
+        if version < LATEST_VERSION:
+            version = await apply_migrations(conn)
+        if settings.DB_PARTITION_CARS:
+            await partition_cars(conn, settings.DB_PARTITION_MONTHS_AHEAD)
+    print(f"Schema is at version {version}")
+
+
+async def main():
+    try:
+        await init_db()
+    finally:
+        await engine.dispose()
 
 
 if __name__ == "__main__":
-    asyncio.run(init_db())
+    asyncio.run(main())
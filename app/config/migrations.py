@@ -0,0 +1,236 @@
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.vehicles import VehicleModel
+
+logger = logging.getLogger(__name__)
+
+schema_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column(
+        "applied_at",
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    ),
+)
+
+URL_HASH_SQL = "('x' || substr(md5(url), 1, 16))::bit(64)::bigint"
+
+
+async def _create_tables(conn: AsyncConnection):
+    await conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS cars ("
+            "id SERIAL PRIMARY KEY, "
+            "url VARCHAR(500) NOT NULL, "
+            "title VARCHAR(255) NOT NULL, "
+            "price_usd INTEGER, "
+            "odometer INTEGER, "
+            "username VARCHAR(255), "
+            "phone_number BIGINT, "
+            "image_url VARCHAR(500), "
+            "images_count INTEGER, "
+            "car_number VARCHAR(50), "
+            "car_vin VARCHAR(50), "
+            "datetime_found TIMESTAMP WITH TIME ZONE NOT NULL"
+            ")"
+        )
+    )
+    await conn.execute(
+        text("CREATE UNIQUE INDEX IF NOT EXISTS ix_cars_url ON cars (url)")
+    )
+
+
+async def _add_search_indexes(conn: AsyncConnection):
+    for column in ("datetime_found", "car_vin", "phone_number", "price_usd"):
+        await conn.execute(
+            text(f"CREATE INDEX IF NOT EXISTS ix_cars_{column} ON cars ({column})")
+        )
+
+
+async def _add_url_hash(conn: AsyncConnection):
+    await conn.execute(
+        text("ALTER TABLE cars ADD COLUMN IF NOT EXISTS url_hash BIGINT")
+    )
+    await conn.execute(
+        text(f"UPDATE cars SET url_hash = {URL_HASH_SQL} WHERE url_hash IS NULL")
+    )
+    await conn.execute(text("ALTER TABLE cars ALTER COLUMN url_hash SET NOT NULL"))
+    await conn.execute(
+        text("CREATE UNIQUE INDEX IF NOT EXISTS ix_cars_url_hash ON cars (url_hash)")
+    )
+    await conn.execute(text("DROP INDEX IF EXISTS ix_cars_url"))
+
+
+async def _add_vehicles(conn: AsyncConnection):
+    await conn.run_sync(VehicleModel.__table__.create, checkfirst=True)
+    await conn.execute(
+        text(
+            "ALTER TABLE cars ADD COLUMN IF NOT EXISTS vehicle_id INTEGER "
+            "REFERENCES vehicles (id)"
+        )
+    )
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_cars_vehicle_id ON cars (vehicle_id)")
+    )
+
+
+async def _fold_vehicle_plates(conn: AsyncConnection):
+    await conn.execute(
+        text(
+            "UPDATE vehicles SET car_number = "
+            "translate(car_number, 'АВЕІКМНОРСТХ', 'ABEIKMHOPCTX') "
+            "WHERE car_number IS NOT NULL"
+        )
+    )
+
+
+MIGRATIONS = [
+    (1, "create base tables", _create_tables),
+    (2, "add cars search indexes", _add_search_indexes),
+    (3, "replace url index with url_hash dedup key", _add_url_hash),
+    (4, "add vehicles table and cars.vehicle_id", _add_vehicles),
+    (5, "fold cyrillic letters in vehicle plates to latin", _fold_vehicle_plates),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+MIGRATIONS_LOCK_ID = 7_204_581_309
+
+
+async def lock_schema(conn: AsyncConnection):
+    await conn.execute(text("SET LOCAL statement_timeout = 0"))
+    await conn.execute(
+        text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATIONS_LOCK_ID}
+    )
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    result = await conn.execute(
+        text("SELECT to_regclass('schema_version') IS NOT NULL")
+    )
+    if not result.scalar():
+        return 0
+    result = await conn.execute(select(func.max(schema_version.c.version)))
+    return result.scalar() or 0
+
+
+async def apply_migrations(conn: AsyncConnection) -> int:
+    await conn.execute(text("SET LOCAL statement_timeout = 0"))
+    await conn.run_sync(schema_metadata.create_all)
+    current = await current_version(conn)
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        await migrate(conn)
+        await conn.execute(
+            schema_version.insert().values(version=version, description=description)
+        )
+        current = version
+
+    return current
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+async def ensure_partitions(
+    conn: AsyncConnection, months_ahead: int, start: Optional[date] = None
+):
+    today = datetime.now(timezone.utc).date()
+    month = _month_start(start or today)
+    last = _month_start(today, months_ahead)
+
+    while month <= last:
+        upper = _month_start(month, 1)
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS cars_y{month:%Y}m{month:%m} "
+                f"PARTITION OF cars FOR VALUES "
+                f"FROM ('{month.isoformat()} 00:00+00') "
+                f"TO ('{upper.isoformat()} 00:00+00')"
+            )
+        )
+        month = upper
+
+
+async def partition_cars(conn: AsyncConnection, months_ahead: int):
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = 'cars'")
+    )
+    if result.scalar() == "p":
+        await ensure_partitions(conn, months_ahead)
+        return
+
+    logger.info("Converting cars table to monthly partitions by datetime_found")
+    await conn.execute(text("SET LOCAL statement_timeout = 0"))
+
+    result = await conn.execute(text("SELECT min(datetime_found) FROM cars"))
+    oldest = result.scalar()
+
+    await conn.execute(text("ALTER SEQUENCE cars_id_seq OWNED BY NONE"))
+    await conn.execute(
+        text(
+            "CREATE TABLE cars_partitioned (LIKE cars INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (datetime_found)"
+        )
+    )
+    await conn.execute(
+        text("CREATE TABLE cars_default PARTITION OF cars_partitioned DEFAULT")
+    )
+    await conn.execute(text("ALTER TABLE cars RENAME TO cars_old"))
+    await conn.execute(text("ALTER TABLE cars_partitioned RENAME TO cars"))
+    await ensure_partitions(
+        conn, months_ahead, oldest.date() if oldest is not None else None
+    )
+
+    await conn.execute(text("INSERT INTO cars SELECT * FROM cars_old"))
+    await conn.execute(text("DROP TABLE cars_old"))
+    await conn.execute(text("ALTER SEQUENCE cars_id_seq OWNED BY cars.id"))
+
+    await conn.execute(
+        text(
+            "ALTER TABLE cars ADD CONSTRAINT cars_pkey "
+            "PRIMARY KEY (id, datetime_found)"
+        )
+    )
+    await conn.execute(
+        text("CREATE UNIQUE INDEX ix_cars_url_hash ON cars (url_hash, datetime_found)")
+    )
+    await conn.execute(
+        text(
+            "ALTER TABLE cars ADD CONSTRAINT cars_vehicle_id_fkey "
+            "FOREIGN KEY (vehicle_id) REFERENCES vehicles (id)"
+        )
+    )
+    for column in (
+        "datetime_found",
+        "car_vin",
+        "phone_number",
+        "price_usd",
+        "vehicle_id",
+    ):
+        await conn.execute(text(f"CREATE INDEX ix_cars_{column} ON cars ({column})"))
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -8,6 +10,19 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int
     POSTGRES_DB: str
 
+    WORKERS: int = 5
+
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: int = 2
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_PARTITION_CARS: bool = False
+    DB_PARTITION_MONTHS_AHEAD: int = 3
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -20,7 +35,25 @@ class Settings(BaseSettings):
             f"postgresql+asyncpg://{self.POSTGRES_USER}:"
             f"{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:"
             f"{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+            f"?prepared_statement_cache_size={self.DB_STATEMENT_CACHE_SIZE}"
         )
 
+    @property
+    def ENGINE_OPTIONS(self) -> dict:
+        return {
+            "echo": self.DB_ECHO,
+            "pool_size": self.DB_POOL_SIZE or self.WORKERS + 1,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "connect_args": {
+                "statement_cache_size": self.DB_STATEMENT_CACHE_SIZE,
+                "server_settings": {
+                    "statement_timeout": str(self.DB_STATEMENT_TIMEOUT_MS),
+                },
+            },
+        }
+
 
 settings = Settings()
@@ -1,14 +1,15 @@
+import csv
 import os
 import asyncio
 from datetime import datetime
-import pandas as pd
 
 from app.dumper.config import Config
-from app.config.db import AsyncSession
-from app.models.cars import CarModel
 
 
 async def dump_postgres_db(cfg: Config):
+    from app.config.db import AsyncSession
+    from app.models.cars import CarModel
+
     os.makedirs(cfg.dump_folder, exist_ok=True)
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
 
@@ -40,13 +41,18 @@ async def dump_postgres_db(cfg: Config):
         print(f"[ERROR] Binary dump failed with return code {process.returncode}")
 
     csv_file = os.path.join(cfg.dump_folder, f"dump_{timestamp}.csv")
+    rows_written = 0
     async with AsyncSession() as session:
-        result = await session.execute(CarModel.__table__.select())
-        cars = result.fetchall()
-
-    if cars:
-        df = pd.DataFrame([dict(row._mapping) for row in cars])
-        df.to_csv(csv_file, index=False)
+        result = await session.stream(CarModel.__table__.select())
+        with open(csv_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(result.keys())
+            async for rows in result.partitions(1000):
+                writer.writerows(rows)
+                rows_written += len(rows)
+
+    if rows_written:
         print(f"[DUMP] Created CSV dump: {csv_file}")
     else:
+        os.remove(csv_file)
         print("[DUMP] No data found to dump into CSV")
@@ -1,27 +1,42 @@
+import hashlib
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, Integer, String
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
 
 
+def hash_url(url: str) -> int:
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def _default_url_hash(context) -> int:
+    return hash_url(context.get_current_parameters()["url"])
+
+
 class CarModel(Base):
     __tablename__ = "cars"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
-    url: Mapped[str] = mapped_column(
-        String(500),
+    url: Mapped[str] = mapped_column(String(500), nullable=False)
+
+    url_hash: Mapped[int] = mapped_column(
+        BigInteger,
         nullable=False,
         unique=True,
         index=True,
+        default=_default_url_hash,
     )
+
     title: Mapped[str] = mapped_column(String(255), nullable=False)
 
     price_usd: Mapped[int] = mapped_column(
         Integer,
         nullable=True,
+        index=True,
     )
 
     odometer: Mapped[int] = mapped_column(
@@ -37,6 +52,7 @@ class CarModel(Base):
     phone_number: Mapped[int] = mapped_column(
         BigInteger,
         nullable=True,
+        index=True,
     )
 
     image_url: Mapped[str] = mapped_column(
@@ -57,10 +73,18 @@ class CarModel(Base):
     car_vin: Mapped[str] = mapped_column(
         String(50),
         nullable=True,
+        index=True,
+    )
+
+    vehicle_id: Mapped[int] = mapped_column(
+        ForeignKey("vehicles.id"),
+        nullable=True,
+        index=True,
     )
 
     datetime_found: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
         default=datetime.utcnow,
+        index=True,
     )
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class VehicleModel(Base):
+    __tablename__ = "vehicles"
+    __table_args__ = (
+        Index("ix_vehicles_phone_title_odometer", "phone_number", "title", "odometer"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    car_vin: Mapped[str] = mapped_column(
+        String(50),
+        nullable=True,
+        index=True,
+    )
+
+    car_number: Mapped[str] = mapped_column(
+        String(50),
+        nullable=True,
+        index=True,
+    )
+
+    phone_number: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=True,
+    )
+
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+
+    odometer: Mapped[int] = mapped_column(
+        Integer,
+        nullable=True,
+    )
+
+    datetime_found: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=datetime.utcnow,
+    )
@@ -0,0 +1,206 @@
+import dataclasses
+from typing import Optional
+
+from sqlalchemy import func, insert, or_, select, tuple_, update
+
+from app.models.vehicles import VehicleModel
+
+CYRILLIC_TO_LATIN = str.maketrans("АВЕІКМНОРСТХ", "ABEIKMHOPCTX")
+
+
+@dataclasses.dataclass(slots=True)
+class VehicleMatch:
+    vehicle_id: int
+    phone_number: Optional[int]
+    car_vin: Optional[str]
+    car_number: Optional[str]
+
+    def conflicts(self, car_vin: Optional[str], car_number: Optional[str]) -> bool:
+        if car_vin and self.car_vin and car_vin != self.car_vin:
+            return True
+        if car_number and self.car_number and car_number != self.car_number:
+            return True
+        return False
+
+
+def normalize_car_number(car_number: Optional[str]) -> Optional[str]:
+    if not car_number:
+        return None
+    return car_number.replace(" ", "").upper().translate(CYRILLIC_TO_LATIN)
+
+
+def phone_key(
+    phone_number: Optional[int], title: Optional[str], odometer: Optional[int]
+) -> Optional[tuple]:
+    if phone_number and title and odometer:
+        return ("phone", phone_number, title, odometer)
+    return None
+
+
+def vehicle_keys(
+    car_vin: Optional[str],
+    car_number: Optional[str],
+    phone_number: Optional[int] = None,
+    title: Optional[str] = None,
+    odometer: Optional[int] = None,
+) -> list[tuple]:
+    keys = []
+    if car_vin:
+        keys.append(("vin", car_vin))
+    car_number = normalize_car_number(car_number)
+    if car_number:
+        keys.append(("plate", car_number))
+    key = phone_key(phone_number, title, odometer)
+    if key and not car_vin:
+        keys.append(key)
+    return keys
+
+
+class VehicleIndex:
+
+    def __init__(self):
+        self._matches: dict[tuple, VehicleMatch] = {}
+
+    def update(self, matches: dict[tuple, VehicleMatch]):
+        self._matches.update(matches)
+
+    def _remember(self, vehicle: VehicleModel):
+        match = VehicleMatch(
+            vehicle.id,
+            vehicle.phone_number,
+            vehicle.car_vin,
+            normalize_car_number(vehicle.car_number),
+        )
+        keys = vehicle_keys(vehicle.car_vin, vehicle.car_number)
+        key = phone_key(vehicle.phone_number, vehicle.title, vehicle.odometer)
+        if key:
+            keys.append(key)
+        for key in keys:
+            self._matches.setdefault(key, match)
+
+    def _lookup(
+        self,
+        keys: list[tuple],
+        car_vin: Optional[str],
+        car_number: Optional[str],
+        pending: Optional[dict] = None,
+    ) -> Optional[VehicleMatch]:
+        car_number = normalize_car_number(car_number)
+        for key in keys:
+            for matches in (pending or {}, self._matches):
+                match = matches.get(key)
+                if match is not None and not match.conflicts(car_vin, car_number):
+                    return match
+        return None
+
+    async def _load(self, session, keys: list[tuple]):
+        vins = [key[1] for key in keys if key[0] == "vin"]
+        plates = [key[1] for key in keys if key[0] == "plate"]
+        triples = [key[1:] for key in keys if key[0] == "phone"]
+
+        conditions = []
+        if vins:
+            conditions.append(VehicleModel.car_vin.in_(vins))
+        if plates:
+            conditions.append(VehicleModel.car_number.in_(plates))
+        if triples:
+            conditions.append(
+                tuple_(
+                    VehicleModel.phone_number,
+                    VehicleModel.title,
+                    VehicleModel.odometer,
+                ).in_(triples)
+            )
+        if not conditions:
+            return
+
+        result = await session.execute(select(VehicleModel).where(or_(*conditions)))
+        for vehicle in result.scalars():
+            self._remember(vehicle)
+
+    async def find(
+        self, car_vin: Optional[str], car_number: Optional[str]
+    ) -> Optional[VehicleMatch]:
+        from app.config.db import AsyncSession
+
+        keys = vehicle_keys(car_vin, car_number)
+        if not keys:
+            return None
+
+        match = self._lookup(keys, car_vin, car_number)
+        if match is None:
+            async with AsyncSession() as session:
+                await self._load(session, keys)
+            match = self._lookup(keys, car_vin, car_number)
+        return match
+
+    async def link(self, session, cars: list) -> dict[tuple, VehicleMatch]:
+        car_keys = [
+            vehicle_keys(
+                car.car_vin,
+                car.car_number,
+                car.phone_number,
+                car.title,
+                car.odometer,
+            )
+            for car in cars
+        ]
+
+        missing = [
+            key
+            for car, keys in zip(cars, car_keys)
+            if self._lookup(keys, car.car_vin, car.car_number) is None
+            for key in keys
+        ]
+        if missing:
+            await self._load(session, missing)
+
+        pending: dict[tuple, VehicleMatch] = {}
+        for car, keys in zip(cars, car_keys):
+            car_number = normalize_car_number(car.car_number)
+            match = self._lookup(keys, car.car_vin, car_number, pending)
+
+            if match is None:
+                result = await session.execute(
+                    insert(VehicleModel)
+                    .values(
+                        car_vin=car.car_vin,
+                        car_number=car_number,
+                        phone_number=car.phone_number,
+                        title=car.title,
+                        odometer=car.odometer,
+                        datetime_found=car.datetime_found,
+                    )
+                    .returning(VehicleModel.id)
+                )
+                match = VehicleMatch(
+                    result.scalar_one(), car.phone_number, car.car_vin, car_number
+                )
+            else:
+                filled = {}
+                if match.phone_number is None and car.phone_number:
+                    filled["phone_number"] = car.phone_number
+                if match.car_vin is None and car.car_vin:
+                    filled["car_vin"] = car.car_vin
+                if match.car_number is None and car_number:
+                    filled["car_number"] = car_number
+
+                if filled:
+                    await session.execute(
+                        update(VehicleModel)
+                        .where(VehicleModel.id == match.vehicle_id)
+                        .values(
+                            {
+                                name: func.coalesce(getattr(VehicleModel, name), value)
+                                for name, value in filled.items()
+                            }
+                        )
+                    )
+                    match = dataclasses.replace(match, **filled)
+                    keys = keys + vehicle_keys(match.car_vin, match.car_number)
+
+            for key in keys:
+                pending[key] = match
+            car.vehicle_id = match.vehicle_id
+
+        return pending
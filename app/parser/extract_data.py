@@ -1,11 +1,15 @@
+from __future__ import annotations
+
 import asyncio
+import dataclasses
 import logging
 import random
 import re
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from playwright.async_api import BrowserContext
-from bs4 import Tag, BeautifulSoup
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
+    from playwright.async_api import BrowserContext
 
 
 logger = logging.getLogger(__name__)
@@ -14,20 +18,93 @@ VIN_RE = re.compile(r"[A-HJ-NPR-Z0-9]{17}")
 CAR_NUMBER_RE = re.compile(r"\b[A-ZА-ЯІЇЄ]{2}\s?\d{4}\s?[A-ZА-ЯІЇЄ]{2}\b")
 PHONE_RE = re.compile(r"[^\d]+")
 
+VIN_LENGTH = 17
+CAR_NUMBER_LENGTHS = range(8, 11)
+VIN_CLASSES = {"vin-code", "label-vin"}
+CAR_NUMBER_CLASSES = {"state-num"}
+IDENTIFIER_CONTAINERS = "span.label-vin, span.vin-code, span.state-num"
+
+VIN_VALUES = {
+    **{str(digit): digit for digit in range(10)},
+    **dict(zip("ABCDEFGH", range(1, 9))),
+    **dict(zip("JKLMN", range(1, 6))),
+    "P": 7,
+    "R": 9,
+    **dict(zip("STUVWXYZ", range(2, 10))),
+}
+VIN_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+@dataclasses.dataclass(slots=True)
+class IdentifierCandidate:
+    kind: str
+    value: str
+    confidence: float
+    location: str
+
+
+def vin_checksum_valid(vin: str) -> bool:
+    total = sum(VIN_VALUES[char] * weight for char, weight in zip(vin, VIN_WEIGHTS))
+    remainder = total % 11
+    return vin[8] == ("X" if remainder == 10 else str(remainder))
 
-def extract_vin(soup: BeautifulSoup) -> Optional[str]:
-    for span in soup.find_all("span"):
-        text = span.get_text(strip=True)
-        if VIN_RE.fullmatch(text):
-            return text
-    return None
 
+def _vin_confidence(vin: str, in_container: bool) -> float:
+    confidence = 0.9 if in_container else 0.5
+    if vin.isdigit():
+        confidence -= 0.3
+    if vin_checksum_valid(vin):
+        confidence += 0.05
+    return round(confidence, 2)
 
-def extract_car_number(soup: BeautifulSoup) -> Optional[str]:
-    for span in soup.find_all("span"):
-        text = span.get_text(strip=True).upper()
+
+def _scan_spans(spans, candidates: list[IdentifierCandidate], seen: set):
+    for span in spans:
+        text = span.get_text(strip=True)
+        length = len(text)
+        if length != VIN_LENGTH and length not in CAR_NUMBER_LENGTHS:
+            continue
+
+        classes = set(span.get("class") or ())
+        location = ".".join(["span", *sorted(classes)])
+
+        if length == VIN_LENGTH and VIN_RE.fullmatch(text):
+            key = ("vin", text)
+            if key not in seen:
+                seen.add(key)
+                confidence = _vin_confidence(text, bool(classes & VIN_CLASSES))
+                candidates.append(
+                    IdentifierCandidate("vin", text, confidence, location)
+                )
+            continue
+
+        text = text.upper()
         if CAR_NUMBER_RE.fullmatch(text):
-            return text
+            key = ("car_number", text)
+            if key not in seen:
+                seen.add(key)
+                confidence = 1.0 if classes & CAR_NUMBER_CLASSES else 0.8
+                candidates.append(
+                    IdentifierCandidate("car_number", text, confidence, location)
+                )
+
+
+def extract_identifiers(soup: BeautifulSoup) -> list[IdentifierCandidate]:
+    candidates = []
+    seen = set()
+
+    _scan_spans(soup.select(IDENTIFIER_CONTAINERS), candidates, seen)
+    if {candidate.kind for candidate in candidates} != {"vin", "car_number"}:
+        _scan_spans(soup.find_all("span"), candidates, seen)
+
+    candidates.sort(key=lambda candidate: candidate.confidence, reverse=True)
+    return candidates
+
+
+def best_identifier(candidates: list[IdentifierCandidate], kind: str) -> Optional[str]:
+    for candidate in candidates:
+        if candidate.kind == kind:
+            return candidate.value
     return None
 
 
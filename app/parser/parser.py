@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import asyncio
 import dataclasses
 import logging
@@ -5,25 +7,29 @@ import os
 import random
 import sys
 from datetime import datetime, timezone
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import httpx
-from bs4 import BeautifulSoup, Tag
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, Browser, BrowserContext
-from sqlalchemy import select
+from sqlalchemy import insert, select
 
-from app.config.db import AsyncSession
+from app.config.db import AsyncSession, engine
 from app.config.init_db import init_db
-from app.models.cars import CarModel
+from app.models.cars import CarModel, hash_url
 from app.parser.extract_data import (
-    extract_car_number,
+    best_identifier,
+    extract_identifiers,
     extract_images_count,
     extract_main_image,
     extract_odometer,
     extract_phone_from_page,
-    extract_vin,
 )
+from app.parser.dedup import VehicleIndex
+from app.parser.profiling import RunProfiler, stage
+
+if TYPE_CHECKING:
+    import httpx
+    from bs4 import Tag
+    from playwright.async_api import Browser, BrowserContext, Playwright
 
 load_dotenv()
 
@@ -32,21 +38,34 @@ PAGE_LIMIT = int(os.getenv("PAGE_LIMIT", "1"))
 WORKERS = int(os.getenv("WORKERS", "5"))
 CAR_PARSE_TIMEOUT = int(os.getenv("CAR_PARSE_TIMEOUT", "120"))
 HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30.0"))
+DEDUP_SKIP_PHONE = os.getenv("DEDUP_SKIP_PHONE", "true").lower() in ("1", "true", "yes")
+
+
+@dataclasses.dataclass(slots=True)
+class CarCard:
+    url: str
+    title: str
+    price_usd: int
+    odometer: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Car:
     url: str
     title: str
     price_usd: int
     odometer: int
-    username: str
-    phone_number: int
-    image_url: str
+    username: Optional[str]
+    phone_number: Optional[int]
+    image_url: Optional[str]
     images_count: int
-    car_number: str
-    car_vin: str
+    car_number: Optional[str]
+    car_vin: Optional[str]
     datetime_found: datetime
+    vehicle_id: Optional[int] = None
+
+    def as_row(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 logging.basicConfig(
@@ -60,16 +79,49 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class BrowserLaunchError(RuntimeError):
+    pass
+
+
 class BrowserContextPool:
 
-    def __init__(self, browser: Browser, size: int = WORKERS):
-        self.browser = browser
+    def __init__(self, size: int = WORKERS):
+        self.playwright: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
         self.size = size
         self._pool: asyncio.Queue[BrowserContext] = asyncio.Queue()
         self._created = 0
         self._lock = asyncio.Lock()
+        self._launch_error: Optional[BrowserLaunchError] = None
+
+    async def _launch_browser(self):
+        if self._launch_error is not None:
+            raise self._launch_error
+
+        from playwright.async_api import async_playwright
+
+        logger.info("Launching browser...")
+        playwright = None
+        try:
+            playwright = await async_playwright().start()
+            self.browser = await playwright.chromium.launch(
+                headless=True,
+                args=[
+                    "--no-sandbox",
+                    "--disable-setuid-sandbox",
+                    "--disable-dev-shm-usage",
+                ],
+            )
+        except Exception as e:
+            if playwright is not None:
+                await playwright.stop()
+            self._launch_error = BrowserLaunchError(f"Cannot launch browser: {e}")
+            raise self._launch_error from e
+        self.playwright = playwright
 
     async def _create_context(self) -> BrowserContext:
+        if self.browser is None:
+            await self._launch_browser()
         context = await self.browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
             "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
@@ -86,8 +138,9 @@ class BrowserContextPool:
         except asyncio.QueueEmpty:
             async with self._lock:
                 if self._created < self.size:
+                    context = await self._create_context()
                     self._created += 1
-                    return await self._create_context()
+                    return context
             return await self._pool.get()
 
     async def release(self, context: BrowserContext):
@@ -104,13 +157,20 @@ class BrowserContextPool:
                 await ctx.close()
             except asyncio.QueueEmpty:
                 break
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
 
 
 async def get_existing_urls(session, urls: list[str]) -> set[str]:
     if not urls:
         return set()
 
-    result = await session.execute(select(CarModel.url).where(CarModel.url.in_(urls)))
+    hashes = [hash_url(url) for url in urls]
+    result = await session.execute(
+        select(CarModel.url).where(CarModel.url_hash.in_(hashes))
+    )
     return {row[0] for row in result.fetchall()}
 
 
@@ -118,26 +178,9 @@ async def save_cars_bulk(session, cars: list[Car]) -> int:
     if not cars:
         return 0
 
-    db_cars = [
-        CarModel(
-            url=car.url,
-            title=car.title,
-            price_usd=car.price_usd,
-            odometer=car.odometer,
-            username=car.username,
-            phone_number=car.phone_number,
-            image_url=car.image_url,
-            images_count=car.images_count,
-            car_number=car.car_number,
-            car_vin=car.car_vin,
-            datetime_found=car.datetime_found,
-        )
-        for car in cars
-    ]
-
-    session.add_all(db_cars)
+    await session.execute(insert(CarModel), [car.as_row() for car in cars])
     await session.commit()
-    return len(db_cars)
+    return len(cars)
 
 
 def extract_car_url(car_card: Tag) -> Optional[str]:
@@ -150,24 +193,11 @@ def extract_car_url(car_card: Tag) -> Optional[str]:
     return url
 
 
-async def parse_single_car(
-    client: httpx.AsyncClient,
-    car_card: Tag,
-    url: str,
-    context_pool: BrowserContextPool,
-) -> Optional[Car]:
-
-    await asyncio.sleep(random.uniform(0.1, 3.0))
-
-    try:
-        async with asyncio.timeout(HTTP_TIMEOUT):
-            response = await client.get(url)
-    except asyncio.TimeoutError:
-        logger.warning(f"HTTP timeout for {url}")
+def extract_car_card(car_card: Tag) -> Optional[CarCard]:
+    url = extract_car_url(car_card)
+    if not url:
         return None
 
-    soup = BeautifulSoup(response.text, "html.parser")
-
     title_el = car_card.select_one(".blue.bold")
     title = title_el.get_text(strip=True) if title_el else "Unknown"
 
@@ -177,21 +207,22 @@ async def parse_single_car(
     except (ValueError, TypeError, KeyError):
         price_usd = 0
 
-    odometer = extract_odometer(car_card)
-
-    username_tag = soup.select_one("#sellerInfoUserName span")
-    username = username_tag.get_text(strip=True) if username_tag else None
+    return CarCard(
+        url=str(url),
+        title=title,
+        price_usd=price_usd,
+        odometer=extract_odometer(car_card),
+    )
 
-    image_url = extract_main_image(soup)
-    images_count = extract_images_count(soup)
-    car_vin = extract_vin(soup)
-    car_number = extract_car_number(soup)
 
+async def extract_phone(url: str, context_pool: BrowserContextPool) -> Optional[int]:
     phone_number = None
-    context = await context_pool.acquire()
+    with stage("browser_acquire"):
+        context = await context_pool.acquire()
     try:
-        async with asyncio.timeout(90):
-            phone_number = await extract_phone_from_page(url, context)
+        with stage("playwright_phone"):
+            async with asyncio.timeout(90):
+                phone_number = await extract_phone_from_page(url, context)
             if phone_number:
                 logger.debug(f"Phone extracted: {phone_number} for {url}")
     except asyncio.TimeoutError:
@@ -200,12 +231,63 @@ async def parse_single_car(
         logger.warning(f"Cannot extract phone for {url}: {e}")
     finally:
         await context_pool.release(context)
+    return phone_number
+
+
+async def parse_single_car(
+    client: httpx.AsyncClient,
+    card: CarCard,
+    context_pool: BrowserContextPool,
+    vehicle_index: VehicleIndex,
+) -> Optional[Car]:
+    url = card.url
+
+    await asyncio.sleep(random.uniform(0.1, 3.0))
+
+    try:
+        with stage("http_detail"):
+            async with asyncio.timeout(HTTP_TIMEOUT):
+                response = await client.get(url)
+    except asyncio.TimeoutError:
+        logger.warning(f"HTTP timeout for {url}")
+        return None
+
+    from bs4 import BeautifulSoup
+
+    with stage("soup_detail"):
+        soup = BeautifulSoup(response.text, "html.parser")
+    del response
+
+    username_tag = soup.select_one("#sellerInfoUserName span")
+    username = username_tag.get_text(strip=True) if username_tag else None
+
+    with stage("extract_detail"):
+        image_url = extract_main_image(soup)
+        images_count = extract_images_count(soup)
+        identifiers = extract_identifiers(soup)
+        car_vin = best_identifier(identifiers, "vin")
+        car_number = best_identifier(identifiers, "car_number")
+    soup.decompose()
+
+    match = None
+    if DEDUP_SKIP_PHONE:
+        try:
+            with stage("db_vehicle_lookup"):
+                match = await vehicle_index.find(car_vin, car_number)
+        except Exception as e:
+            logger.warning(f"Vehicle lookup failed for {url}: {e}")
+
+    if match is not None and match.phone_number:
+        logger.info(f"Known vehicle {match.vehicle_id}, skipping phone for {url}")
+        phone_number = match.phone_number
+    else:
+        phone_number = await extract_phone(url, context_pool)
 
     return Car(
         url=url,
-        title=title,
-        price_usd=price_usd,
-        odometer=odometer,
+        title=card.title,
+        price_usd=card.price_usd,
+        odometer=card.odometer,
         username=username,
         phone_number=phone_number,
         image_url=image_url,
@@ -219,8 +301,8 @@ async def parse_single_car(
 async def process_page(
     page_num: int,
     client: httpx.AsyncClient,
-    session,
     context_pool: BrowserContextPool,
+    vehicle_index: VehicleIndex,
     semaphore: asyncio.Semaphore,
 ) -> int:
 
@@ -228,8 +310,9 @@ async def process_page(
     logger.info(f"Fetching page {page_num}: {url}")
 
     try:
-        async with asyncio.timeout(HTTP_TIMEOUT):
-            response = await client.get(url)
+        with stage("http_listing"):
+            async with asyncio.timeout(HTTP_TIMEOUT):
+                response = await client.get(url)
     except asyncio.TimeoutError:
         logger.error(f"Timeout fetching page {page_num}")
         return 0
@@ -237,62 +320,71 @@ async def process_page(
         logger.error(f"Error fetching page {page_num}: {e}")
         return 0
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    car_cards = soup.select(".content-bar")
-
-    if not car_cards:
-        logger.warning(f"No car cards found on page {page_num}")
-        return 0
+    from bs4 import BeautifulSoup
 
-    card_url_pairs = []
-    for card in car_cards:
-        url = extract_car_url(card)
-        if url:
-            card_url_pairs.append((card, url))
+    with stage("soup_listing"):
+        soup = BeautifulSoup(response.text, "html.parser")
+        car_tags = soup.select(".content-bar")
+        cards = [card for card in map(extract_car_card, car_tags) if card]
+    del response, car_tags
+    soup.decompose()
 
-    if not card_url_pairs:
+    if not cards:
+        logger.warning(f"No car cards found on page {page_num}")
         return 0
 
-    all_urls = [url for _, url in card_url_pairs]
-    existing_urls = await get_existing_urls(session, all_urls)
+    all_urls = [card.url for card in cards]
+    with stage("db_existing_urls"):
+        async with AsyncSession() as session:
+            existing_urls = await get_existing_urls(session, all_urls)
 
-    new_cards = [
-        (card, url) for card, url in card_url_pairs if url not in existing_urls
-    ]
+    new_cards = [card for card in cards if card.url not in existing_urls]
 
-    skipped = len(card_url_pairs) - len(new_cards)
+    skipped = len(cards) - len(new_cards)
     if skipped > 0:
         logger.info(f"Page {page_num}: skipping {skipped} existing cars")
 
     if not new_cards:
         return 0
 
-    async def parse_with_limit(card: Tag, url: str) -> Optional[Car]:
+    async def parse_with_limit(card: CarCard) -> Optional[Car]:
         async with semaphore:
             try:
                 async with asyncio.timeout(CAR_PARSE_TIMEOUT):
-                    return await parse_single_car(client, card, url, context_pool)
+                    return await parse_single_car(
+                        client, card, context_pool, vehicle_index
+                    )
+            except BrowserLaunchError:
+                raise
             except asyncio.TimeoutError:
-                logger.error(f"Total timeout parsing {url}")
+                logger.error(f"Total timeout parsing {card.url}")
                 return None
             except Exception as e:
-                logger.error(f"Error parsing {url}: {e}")
+                logger.error(f"Error parsing {card.url}: {e}")
                 return None
 
-    tasks = [parse_with_limit(card, url) for card, url in new_cards]
+    tasks = [parse_with_limit(card) for card in new_cards]
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
+    for result in results:
+        if isinstance(result, BrowserLaunchError):
+            raise result
+
     cars_to_save = [r for r in results if isinstance(r, Car)]
 
     if cars_to_save:
-        try:
-            saved_count = await save_cars_bulk(session, cars_to_save)
-            logger.info(f"Page {page_num}: saved {saved_count} new cars")
-            return saved_count
-        except Exception as e:
-            logger.error(f"Failed to save cars from page {page_num}: {e}")
-            await session.rollback()
-            return 0
+        async with AsyncSession() as session:
+            try:
+                with stage("db_save"):
+                    matches = await vehicle_index.link(session, cars_to_save)
+                    saved_count = await save_cars_bulk(session, cars_to_save)
+                vehicle_index.update(matches)
+                logger.info(f"Page {page_num}: saved {saved_count} new cars")
+                return saved_count
+            except Exception as e:
+                logger.error(f"Failed to save cars from page {page_num}: {e}")
+                await session.rollback()
+                return 0
 
     return 0
 
@@ -301,40 +393,36 @@ async def get_home_cars():
     semaphore = asyncio.Semaphore(WORKERS)
     total_saved = 0
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                "--no-sandbox",
-                "--disable-setuid-sandbox",
-                "--disable-dev-shm-usage",
-            ],
-        )
+    import httpx
 
-        context_pool = BrowserContextPool(browser, size=WORKERS)
+    context_pool = BrowserContextPool(size=WORKERS)
+    vehicle_index = VehicleIndex()
 
-        try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                async with AsyncSession() as session:
-                    for page_num in range(1, PAGE_LIMIT + 1):
-                        saved = await process_page(
-                            page_num, client, session, context_pool, semaphore
-                        )
-                        total_saved += saved
-        finally:
-            await context_pool.close_all()
-            await browser.close()
+    try:
+        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+            for page_num in range(1, PAGE_LIMIT + 1):
+                saved = await process_page(
+                    page_num, client, context_pool, vehicle_index, semaphore
+                )
+                total_saved += saved
+    finally:
+        await context_pool.close_all()
 
     logger.info(f"Total cars saved: {total_saved}")
     return total_saved
 
 
 async def main():
-    logger.info("Initializing DB...")
-    await init_db()
-    logger.info(f"Starting parser with {WORKERS} workers...")
-    await get_home_cars()
-    logger.info("Finished.")
+    async with RunProfiler():
+        logger.info("Initializing DB...")
+        with stage("init_db"):
+            await init_db()
+        logger.info(f"Starting parser with {WORKERS} workers...")
+        try:
+            await get_home_cars()
+        finally:
+            await engine.dispose()
+        logger.info("Finished.")
 
 
 if __name__ == "__main__":
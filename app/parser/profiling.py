@@ -0,0 +1,245 @@
+import asyncio
+import cProfile
+import csv
+import dataclasses
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = ("1", "true", "yes")
+
+_active: Optional["RunProfiler"] = None
+
+
+@dataclasses.dataclass(slots=True)
+class StageStats:
+    count: int = 0
+    total: float = 0.0
+    peak: float = 0.0
+
+
+@contextmanager
+def stage(name: str):
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_stage(name, time.perf_counter() - start)
+
+
+class StackSampler:
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, hz: float):
+        self.loop = loop
+        self.interval = 1.0 / hz
+        self.stacks: Counter[str] = Counter()
+        self._target_ident = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _task_name(self) -> str:
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        if task is None:
+            return "<loop>"
+        return getattr(task.get_coro(), "__qualname__", task.get_name())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_ident)
+            if frame is None:
+                continue
+
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                module = frame.f_globals.get("__name__", "?")
+                frames.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            frames.append(self._task_name())
+            self.stacks[";".join(reversed(frames))] += 1
+
+
+class RunProfiler:
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        folder: Optional[str] = None,
+        full_rate: Optional[float] = None,
+    ):
+        if enabled is None:
+            enabled = os.getenv("PROFILE_ENABLED", "false").lower() in TRUE_VALUES
+        if folder is None:
+            folder = os.getenv("PROFILE_FOLDER", "dumps/profiles")
+        if full_rate is None:
+            full_rate = float(os.getenv("PROFILE_FULL_RATE", "0.0"))
+
+        self.enabled = enabled
+        self.full = enabled and random.random() < full_rate
+        self.sample_hz = float(os.getenv("PROFILE_SAMPLE_HZ", "10"))
+        self.loop_lag_interval = float(os.getenv("PROFILE_LOOP_LAG_INTERVAL", "1.0"))
+        self.tracemalloc_interval = float(
+            os.getenv("PROFILE_TRACEMALLOC_INTERVAL", "300")
+        )
+        self.tracemalloc_frames = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "5"))
+        self.folder = os.path.join(
+            folder, datetime.now().strftime("run_%Y-%m-%d_%H-%M-%S")
+        )
+        self.stages: dict[str, StageStats] = {}
+        self.lag_samples: list[tuple[float, float]] = []
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._tasks: list[asyncio.Task] = []
+        self._snapshots = 0
+
+    def record_stage(self, name: str, elapsed: float):
+        stats = self.stages.setdefault(name, StageStats())
+        stats.count += 1
+        stats.total += elapsed
+        stats.peak = max(stats.peak, elapsed)
+
+    async def __aenter__(self) -> "RunProfiler":
+        global _active
+
+        if not self.enabled:
+            return self
+
+        os.makedirs(self.folder, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        _active = self
+
+        if self.sample_hz > 0:
+            self._sampler = StackSampler(loop, self.sample_hz)
+            self._sampler.start()
+
+        if self.loop_lag_interval > 0:
+            self._tasks.append(asyncio.create_task(self._monitor_loop_lag()))
+
+        if self.full:
+            if self.tracemalloc_interval > 0:
+                tracemalloc.start(self.tracemalloc_frames)
+                self._tasks.append(asyncio.create_task(self._take_snapshots()))
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+        logger.info(
+            f"Profiling enabled ({'full' if self.full else 'sampling'}), "
+            f"artifacts in {self.folder}"
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        global _active
+
+        if not self.enabled:
+            return
+
+        if self._profile is not None:
+            self._profile.disable()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        _active = None
+
+        try:
+            self._write_artifacts()
+        except Exception as e:
+            logger.error(f"Failed to write profiling artifacts: {e}")
+
+    async def _monitor_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        interval = self.loop_lag_interval
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - start - interval, 0.0)
+            self.lag_samples.append((time.time(), lag))
+
+    async def _take_snapshots(self):
+        while True:
+            await asyncio.sleep(self.tracemalloc_interval)
+            self._dump_snapshot()
+
+    def _dump_snapshot(self):
+        if not tracemalloc.is_tracing():
+            return
+        self._snapshots += 1
+        path = os.path.join(self.folder, f"tracemalloc_{self._snapshots:03d}.snap")
+        tracemalloc.take_snapshot().dump(path)
+
+    def _write_artifacts(self):
+        if self._profile is not None:
+            self._profile.dump_stats(os.path.join(self.folder, "cprofile.prof"))
+            with open(os.path.join(self.folder, "cprofile.txt"), "w") as f:
+                stats = pstats.Stats(self._profile, stream=f)
+                stats.sort_stats("cumulative").print_stats(50)
+
+        if tracemalloc.is_tracing():
+            self._dump_snapshot()
+            with open(os.path.join(self.folder, "tracemalloc_top.txt"), "w") as f:
+                snapshot = tracemalloc.take_snapshot()
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+            tracemalloc.stop()
+
+        if self._sampler is not None:
+            with open(os.path.join(self.folder, "stacks.folded"), "w") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        if self.lag_samples:
+            with open(os.path.join(self.folder, "loop_lag.csv"), "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["timestamp", "lag_seconds"])
+                writer.writerows(self.lag_samples)
+            lags = sorted(lag for _, lag in self.lag_samples)
+            p95 = lags[int(len(lags) * 0.95) - 1] if len(lags) >= 20 else lags[-1]
+            logger.info(f"Event loop lag: p95={p95:.3f}s max={lags[-1]:.3f}s")
+
+        if self.stages:
+            with open(os.path.join(self.folder, "stages.csv"), "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "total_seconds", "max_seconds"])
+                for name, stats in sorted(self.stages.items()):
+                    writer.writerow(
+                        [name, stats.count, f"{stats.total:.3f}", f"{stats.peak:.3f}"]
+                    )
+                    logger.info(
+                        f"Stage {name}: {stats.count} calls, {stats.total:.1f}s total, "
+                        f"{stats.peak:.1f}s max"
+                    )
+
+        logger.info(f"Profiling artifacts written to {self.folder}")
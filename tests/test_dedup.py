@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.models.vehicles import VehicleModel
+from app.parser.dedup import VehicleIndex, normalize_car_number, vehicle_keys
+
+PHONE = 380501234567
+TITLE = "Volkswagen Golf 2010"
+ODOMETER = 180000
+
+
+class FakeResult:
+
+    def __init__(self, vehicles=(), scalar=None):
+        self._vehicles = vehicles
+        self._scalar = scalar
+
+    def scalars(self):
+        return iter(self._vehicles)
+
+    def scalar_one(self):
+        return self._scalar
+
+
+class FakeSession:
+
+    def __init__(self, vehicles=()):
+        self.vehicles = list(vehicles)
+        self.inserts = 0
+        self.updates = 0
+
+    async def execute(self, statement):
+        if statement.is_select:
+            return FakeResult(self.vehicles)
+        if statement.is_insert:
+            self.inserts += 1
+            return FakeResult(scalar=100 + self.inserts)
+        self.updates += 1
+        return FakeResult()
+
+
+def make_vehicle(id, car_vin=None, car_number=None, phone_number=PHONE):
+    return VehicleModel(
+        id=id,
+        car_vin=car_vin,
+        car_number=car_number,
+        phone_number=phone_number,
+        title=TITLE,
+        odometer=ODOMETER,
+    )
+
+
+def make_car(car_vin=None, car_number=None, phone_number=PHONE):
+    return SimpleNamespace(
+        car_vin=car_vin,
+        car_number=car_number,
+        phone_number=phone_number,
+        title=TITLE,
+        odometer=ODOMETER,
+        datetime_found=datetime.now(timezone.utc),
+        vehicle_id=None,
+    )
+
+
+def indexed(*vehicles):
+    index = VehicleIndex()
+    for vehicle in vehicles:
+        index._remember(vehicle)
+    return index
+
+
+def test_normalize_car_number_folds_cyrillic_lookalikes():
+    assert normalize_car_number("АА 1234 ВВ") == normalize_car_number("AA 1234 BB")
+    assert normalize_car_number("кх 0001 ет") == "KX0001ET"
+
+
+def test_phone_key_only_without_vin():
+    assert vehicle_keys("WVWZZZ1KZAW000001", None, PHONE, TITLE, ODOMETER) == [
+        ("vin", "WVWZZZ1KZAW000001")
+    ]
+    assert ("phone", PHONE, TITLE, ODOMETER) in vehicle_keys(
+        None, None, PHONE, TITLE, ODOMETER
+    )
+
+
+def test_lookup_rejects_phone_key_match_with_different_vin():
+    index = indexed(make_vehicle(1, car_vin="WAUZZZ8K9BA123456"))
+    keys = [("phone", PHONE, TITLE, ODOMETER)]
+
+    assert index._lookup(keys, "WVWZZZ1KZAW000001", None) is None
+    assert index._lookup(keys, None, None).vehicle_id == 1
+
+
+def test_lookup_rejects_plate_match_with_different_vin():
+    index = indexed(make_vehicle(1, "WAUZZZ8K9BA123456", "AA1234BB"))
+
+    keys = vehicle_keys("WVWZZZ1KZAW000001", "AA 1234 BB")
+    assert index._lookup(keys, "WVWZZZ1KZAW000001", "AA 1234 BB") is None
+
+    keys = vehicle_keys(None, "АА 1234 ВВ")
+    assert index._lookup(keys, None, "АА 1234 ВВ").vehicle_id == 1
+
+
+def test_lookup_rejects_vin_match_with_different_plate():
+    index = indexed(make_vehicle(1, "WAUZZZ8K9BA123456", "AA1234BB"))
+    keys = vehicle_keys("WAUZZZ8K9BA123456", "KA 0001 XX")
+
+    assert index._lookup(keys, "WAUZZZ8K9BA123456", "KA 0001 XX") is None
+
+
+def test_link_keeps_identical_dealer_units_apart():
+    session = FakeSession([make_vehicle(1, car_vin="WAUZZZ8K9BA123456")])
+    cars = [
+        make_car(car_vin="WVWZZZ1KZAW000001"),
+        make_car(car_vin="WVWZZZ1KZAW000002"),
+        make_car(),
+    ]
+
+    asyncio.run(VehicleIndex().link(session, cars))
+
+    assert cars[0].vehicle_id not in (1, cars[1].vehicle_id)
+    assert cars[1].vehicle_id != 1
+    assert cars[2].vehicle_id == 1
+    assert session.inserts == 2
+
+
+def test_link_does_not_merge_relisting_with_other_vin_on_same_plate():
+    session = FakeSession([make_vehicle(1, "WAUZZZ8K9BA123456", "AA1234BB")])
+    car = make_car("WVWZZZ1KZAW000001", "AA 1234 BB", phone_number=380671112233)
+
+    matches = asyncio.run(VehicleIndex().link(session, [car]))
+
+    assert car.vehicle_id == 101
+    assert matches[("plate", "AA1234BB")].phone_number == 380671112233
+
+
+def test_link_fills_missing_fields_on_matched_vehicle():
+    session = FakeSession(
+        [make_vehicle(1, car_vin="WAUZZZ8K9BA123456", phone_number=None)]
+    )
+    car = make_car("WAUZZZ8K9BA123456", "АА 1234 ВВ")
+
+    matches = asyncio.run(VehicleIndex().link(session, [car]))
+
+    assert car.vehicle_id == 1
+    assert session.updates == 1
+    match = matches[("plate", "AA1234BB")]
+    assert (match.vehicle_id, match.phone_number) == (1, PHONE)